@@ -25,6 +25,7 @@ import os
 import sys
 import tempfile
 import types
+from collections.abc import Iterator
 from pathlib import Path
 
 
@@ -68,10 +69,45 @@ def _get_queue_dir() -> Path:
     return Path(tempfile.gettempdir()) / "pss-queue"
 
 
+def _is_within(path: str, root: str) -> bool:
+    """True if the real path `path` lies at or below the real path `root`."""
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Different drives on Windows -- certainly not inside root
+        return False
+
+
+def _scandir_pss(root: str, root_real: str) -> Iterator[str]:
+    """Yield the paths of regular .pss files under root, recursively.
+
+    Symlinks are never followed or yielded: a symlinked directory can lead
+    outside the skill directory, and a symlinked .pss file is not ours to
+    delete. A subdirectory is only descended when its real path stays inside
+    root_real, which also stops Windows junctions (not symlinks, yet still
+    redirects) from leading the walk out of the skill tree. A directory that
+    cannot be opened (unreadable, or removed by a concurrent cleanup) is
+    skipped.
+    """
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if _is_within(os.path.realpath(entry.path), root_real):
+                    yield from _scandir_pss(entry.path, root_real)
+            elif entry.name.endswith(".pss") and entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+
 def _collect_pss_files(
     locations: list[tuple[str, Path]],
     queue_dir: Path,
-) -> dict[str, list[Path]]:
+) -> dict[str, list[str]]:
     """Collect all .pss files from skill directories and the queue directory.
 
     Args:
@@ -81,35 +117,38 @@ def _collect_pss_files(
     Returns:
         Dict mapping source label to list of .pss file paths found there.
     """
-    results: dict[str, list[Path]] = {}
+    results: dict[str, list[str]] = {}
 
     # Scan each skill directory recursively for .pss files
     for source, skill_dir in locations:
-        if not skill_dir.exists() or not skill_dir.is_dir():
+        if not os.path.isdir(skill_dir):
             continue
-        # Filter out files outside skill_dir (reached via symlinked dirs) and
-        # symlink .pss files themselves to prevent traversal into unrelated dirs.
-        skill_dir_resolved = skill_dir.resolve()
         pss_files = sorted(
-            p for p in skill_dir.rglob("*.pss")
-            if not p.is_symlink()
-            and p.resolve().is_relative_to(skill_dir_resolved)
+            _scandir_pss(str(skill_dir), os.path.realpath(skill_dir))
         )
         if pss_files:
             results[f"{source}:{skill_dir}"] = pss_files
 
-    # Scan queue directory non-recursively for .pss files
-    if queue_dir.exists() and queue_dir.is_dir():
-        # glob("*.pss") is non-recursive -- only top-level matches
-        queue_files = sorted(queue_dir.glob("*.pss"))
-        if queue_files:
-            results[f"queue:{queue_dir}"] = queue_files
+    # Scan queue directory non-recursively for .pss files -- only top-level
+    # matches. A queue dir that is missing, or that cannot be read (it lives in
+    # shared temp and may belong to another user), yields no queue files.
+    try:
+        with os.scandir(queue_dir) as it:
+            queue_files = sorted(
+                e.path
+                for e in it
+                if e.name.endswith(".pss") and not e.is_dir(follow_symlinks=False)
+            )
+    except OSError:
+        queue_files = []
+    if queue_files:
+        results[f"queue:{queue_dir}"] = queue_files
 
     return results
 
 
 def _run_cleanup(
-    collected: dict[str, list[Path]],
+    collected: dict[str, list[str]],
     *,
     dry_run: bool,
     verbose: bool,
@@ -136,15 +175,19 @@ def _run_cleanup(
                 total_deleted += 1
             else:
                 try:
-                    pss_path.unlink(missing_ok=True)
-                    if verbose:
-                        print(f"  Deleted: {pss_path}")
-                    total_deleted += 1
+                    os.unlink(pss_path)
+                except FileNotFoundError:
+                    # Already gone (e.g. a concurrent cleanup) -- nothing to do
+                    pass
                 except OSError as e:
                     print(
                         f"  Warning: Cannot delete {pss_path}: {e}",
                         file=sys.stderr,
                     )
+                    continue
+                if verbose:
+                    print(f"  Deleted: {pss_path}")
+                total_deleted += 1
 
     return total_deleted
 
@@ -1,208 +1,298 @@
 #!/usr/bin/env python3
-"""Tests for pss_cleanup.py - stale .pss file cleanup script."""
+"""Tests for pss_cleanup.py - stale .pss file cleanup script.
 
+Behaviour tests call ``pss_cleanup.main()`` in-process: a spawn per test pays a
+full interpreter start-up for a script whose own work is one directory scan.
+The ``--help`` run in TestCleanupCLI is the one real subprocess, kept so the
+``__main__`` entry wiring stays covered.
+"""
+
+import importlib
+import os
 import subprocess
 import sys
 from pathlib import Path
+from typing import Any
 
 import pytest
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 SCRIPT_PATH = PROJECT_ROOT / "scripts" / "pss_cleanup.py"
 
+if str(SCRIPT_PATH.parent) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_PATH.parent))
+pss_cleanup = importlib.import_module("pss_cleanup")
+
+
+def _touch(path: Path, data: bytes = b"x") -> None:
+    """Create (or truncate) a fixture file with raw os calls; content is irrelevant."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
 
-def run_cleanup(*args: str) -> subprocess.CompletedProcess[str]:
-    """Run pss_cleanup.py with given args and return result."""
+
+def run_cleanup(*args: str) -> subprocess.CompletedProcess[bytes]:
+    """Run pss_cleanup.py with given args and return result (undecoded output)."""
     cmd = [sys.executable, str(SCRIPT_PATH)] + list(args)
-    return subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    return subprocess.run(cmd, capture_output=True, timeout=30)
+
+
+def run_main(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    *args: str,
+    env: dict[str, str] | None = None,
+) -> subprocess.CompletedProcess[str]:
+    """Run pss_cleanup.main() in-process with the given argv and env overrides.
+
+    Returns a CompletedProcess so assertions read the same as for a spawn.
+    """
+    for key, value in (env or {}).items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(sys, "argv", ["pss_cleanup.py", *args])
+    try:
+        returncode = pss_cleanup.main()
+    except SystemExit as exc:
+        # sys.exit() with no argument exits 0; a non-int payload exits 1
+        if exc.code is None:
+            returncode = 0
+        else:
+            returncode = exc.code if isinstance(exc.code, int) else 1
+    captured = capsys.readouterr()
+    return subprocess.CompletedProcess(
+        ["pss_cleanup.py", *args], returncode, captured.out, captured.err
+    )
+
+
+@pytest.fixture(scope="session")
+def help_output() -> subprocess.CompletedProcess[bytes]:
+    """The script's --help run, spawned once per session; its output never varies."""
+    return run_cleanup("--help")
+
+
+@pytest.fixture
+def skill_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """An empty skill dir set up as the only scan location, with no queue dir.
+
+    Pointing the queue override at a missing path keeps every test away from
+    the real system temp pss-queue.
+    """
+    directory = tmp_path / "skills"
+    directory.mkdir()
+    monkeypatch.setenv("PSS_CLEANUP_TEST_SKILL_DIRS", str(directory))
+    monkeypatch.setenv("PSS_CLEANUP_TEST_QUEUE_DIR", str(tmp_path / "nonexistent"))
+    return directory
 
 
 class TestCleanupDryRun:
     """Tests for dry-run mode that should never delete files."""
 
     def test_dry_run_no_files_exits_zero(
-        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
     ) -> None:
         """Dry run with no .pss files exits with code 0 and reports nothing found."""
-        # Create a fake skill dir with no .pss files
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         (skill_dir / "some_skill.md").touch()
 
-        # We patch get_all_skill_locations via env or by running as subprocess
-        # Since the script imports from pss_discover, we test via subprocess
-        # using a mock discover script
-        mock_discover = tmp_path / "pss_discover.py"
-        mock_discover.write_text(
-            f"from pathlib import Path\n"
-            f"def get_all_skill_locations(scan_all_projects=False):\n"
-            f"    return [('test', Path('{skill_dir}'))]\n"
-        )
-
-        # Copy the cleanup script and patch its sys.path to use our mock
-        env_script = tmp_path / "run_cleanup.py"
-        env_script.write_text(
-            f"import sys\n"
-            f"sys.path.insert(0, '{tmp_path}')\n"
-            f"sys.path.insert(0, '{SCRIPT_PATH.parent}')\n"
-            f"# Override the import path so pss_discover resolves to our mock\n"
-            f"import importlib\n"
-            f"import pss_discover\n"
-            f"importlib.reload(pss_discover)\n"
-            f"# Now run the actual script's main\n"
-            f"exec(open('{SCRIPT_PATH}').read())\n"
-        )
-
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--dry-run"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
-        # The script should handle gracefully even if real skill dirs are empty
+        result = run_main(monkeypatch, capsys, "--dry-run")
         assert result.returncode == 0
 
-    def test_dry_run_finds_pss_files_but_does_not_delete(self, tmp_path: Path) -> None:
+    def test_dry_run_finds_pss_files_but_does_not_delete(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Dry run reports .pss files it would delete but leaves them intact."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         pss_file = skill_dir / "stale.pss"
-        pss_file.write_text("stale content")
+        _touch(pss_file)
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--dry-run"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
+        result = run_main(monkeypatch, capsys, "--dry-run")
         assert result.returncode == 0
         # File must still exist after dry run
         assert pss_file.exists(), "Dry run must NOT delete files"
 
-    def test_dry_run_output_contains_would_delete(self, tmp_path: Path) -> None:
+    def test_dry_run_output_contains_would_delete(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Dry run output includes '[DRY RUN] Would delete:' for each .pss file found."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         pss_file = skill_dir / "stale.pss"
-        pss_file.write_text("content")
+        _touch(pss_file)
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--dry-run"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
+        result = run_main(monkeypatch, capsys, "--dry-run")
         assert "[DRY RUN] Would delete:" in result.stdout
 
 
 class TestCleanupActualDeletion:
     """Tests for actual cleanup mode that deletes .pss files."""
 
-    def test_deletes_pss_files(self, tmp_path: Path) -> None:
+    def test_deletes_pss_files(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Actual cleanup deletes all .pss files from skill directories."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         pss1 = skill_dir / "a.pss"
         pss2 = skill_dir / "b.pss"
         keep = skill_dir / "keep.md"
-        pss1.write_text("stale1")
-        pss2.write_text("stale2")
-        keep.write_text("keep me")
-
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--verbose"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
+        _touch(pss1)
+        _touch(pss2)
+        _touch(keep)
+
+        result = run_main(monkeypatch, capsys, "--verbose")
         assert result.returncode == 0
         assert not pss1.exists(), ".pss file should be deleted"
         assert not pss2.exists(), ".pss file should be deleted"
         assert keep.exists(), "Non-.pss files must be preserved"
 
-    def test_deletes_nested_pss_files(self, tmp_path: Path) -> None:
+    def test_deletes_nested_pss_files(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Cleanup finds and deletes .pss files in subdirectories recursively."""
-        skill_dir = tmp_path / "skills"
         nested = skill_dir / "sub" / "deep"
         nested.mkdir(parents=True)
         pss_file = nested / "nested.pss"
-        pss_file.write_text("nested stale")
+        _touch(pss_file)
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH)],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
+        result = run_main(monkeypatch, capsys)
         assert result.returncode == 0
         assert not pss_file.exists(), "Nested .pss should be deleted"
 
-    def test_verbose_prints_deleted_paths(self, tmp_path: Path) -> None:
+    def test_verbose_prints_deleted_paths(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Verbose mode prints 'Deleted: <path>' for each file removed."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         pss_file = skill_dir / "verbose_test.pss"
-        pss_file.write_text("content")
+        _touch(pss_file)
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--verbose"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            },
-        )
+        result = run_main(monkeypatch, capsys, "--verbose")
         assert result.returncode == 0
         assert "Deleted:" in result.stdout
 
+    def test_symlinks_are_not_followed_or_deleted(
+        self,
+        tmp_path: Path,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Symlinked dirs are not descended and symlinked .pss files are kept."""
+        outside = tmp_path / "outside"
+        outside.mkdir()
+        outside_pss = outside / "foreign.pss"
+        _touch(outside_pss)
+        try:
+            (skill_dir / "linked_dir").symlink_to(outside, target_is_directory=True)
+            (skill_dir / "linked.pss").symlink_to(outside_pss)
+        except OSError:
+            pytest.skip("symlinks not supported on this platform")
+
+        result = run_main(monkeypatch, capsys)
+        assert result.returncode == 0
+        assert "No stale .pss files found" in result.stdout
+        assert outside_pss.exists(), "Files reached through a symlink must be kept"
+        assert (skill_dir / "linked.pss").is_symlink()
+
+    def test_redirected_dir_outside_skill_dir_is_not_descended(
+        self,
+        tmp_path: Path,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """A non-symlink dir whose real path leaves the skill dir is not walked.
+
+        Stands in for a Windows junction: is_symlink() is False, but realpath
+        resolves outside the tree.
+        """
+        junction = skill_dir / "junction"
+        junction.mkdir()
+        foreign = junction / "foreign.pss"
+        _touch(foreign)
+        outside = str(tmp_path / "outside")
+
+        real_realpath = os.path.realpath
+
+        def fake_realpath(path: Any) -> str:
+            if os.fspath(path) == str(junction):
+                return outside
+            return real_realpath(path)
+
+        monkeypatch.setattr(pss_cleanup.os.path, "realpath", fake_realpath)
+
+        result = run_main(monkeypatch, capsys)
+        assert result.returncode == 0
+        assert "No stale .pss files found" in result.stdout
+        assert foreign.exists(), "Files reached outside the skill dir must be kept"
+
+    def test_vanished_subdir_does_not_abort_cleanup(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """A subdir removed mid-walk is skipped; the other .pss files still go."""
+        gone = skill_dir / "gone"
+        gone.mkdir()
+        _touch(gone / "inside.pss")
+        top = skill_dir / "top.pss"
+        _touch(top)
+
+        real_scandir = os.scandir
+
+        def fake_scandir(path: str) -> Any:
+            if os.fspath(path) == str(gone):
+                raise FileNotFoundError(2, "No such file or directory", str(gone))
+            return real_scandir(path)
+
+        monkeypatch.setattr(pss_cleanup.os, "scandir", fake_scandir)
+
+        result = run_main(monkeypatch, capsys)
+        assert result.returncode == 0
+        assert not top.exists(), "Files outside the vanished subdir must be deleted"
+        assert "Cleaned 1 .pss files from" in result.stdout
+
 
 class TestCleanupTmpQueue:
     """Tests for pss-queue temp directory scanning."""
 
     def test_scans_tmp_queue(
-        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
     ) -> None:
         """Cleanup scans system temp pss-queue for .pss files (non-recursive)."""
         # Create a fake tmp queue dir
         queue_dir = tmp_path / "pss-queue"
         queue_dir.mkdir()
         pss_file = queue_dir / "queued.pss"
-        pss_file.write_text("queued")
+        _touch(pss_file)
         # Also a nested one that should NOT be found (non-recursive for queue)
         nested_dir = queue_dir / "nested"
         nested_dir.mkdir()
         nested_pss = nested_dir / "nested.pss"
-        nested_pss.write_text("nested in queue")
+        _touch(nested_pss)
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH), "--dry-run"],
-            capture_output=True,
-            text=True,
-            timeout=30,
+        result = run_main(
+            monkeypatch,
+            capsys,
+            "--dry-run",
             env={
-                **__import__("os").environ,
                 "PSS_CLEANUP_TEST_SKILL_DIRS": "",
                 "PSS_CLEANUP_TEST_QUEUE_DIR": str(queue_dir),
             },
@@ -213,60 +303,94 @@ class TestCleanupTmpQueue:
         # Should NOT find nested one (non-recursive for queue)
         assert "nested.pss" not in result.stdout and str(nested_pss) not in result.stdout
 
+    def test_queue_dir_named_pss_is_not_reported(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """A directory named like a .pss file in the queue is not a file to delete."""
+        queue_dir = tmp_path / "pss-queue"
+        queue_dir.mkdir()
+        (queue_dir / "dir.pss").mkdir()
+
+        result = run_main(
+            monkeypatch,
+            capsys,
+            env={
+                "PSS_CLEANUP_TEST_SKILL_DIRS": "",
+                "PSS_CLEANUP_TEST_QUEUE_DIR": str(queue_dir),
+            },
+        )
+        assert result.returncode == 0
+        assert "No stale .pss files found" in result.stdout
+        assert (queue_dir / "dir.pss").is_dir()
+
+    def test_unreadable_queue_dir_still_cleans_skill_dirs(
+        self,
+        tmp_path: Path,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """A queue dir that cannot be read counts as empty; skill dirs still clean."""
+        queue_dir = tmp_path / "pss-queue"
+        queue_dir.mkdir()
+        _touch(queue_dir / "queued.pss")
+        stale = skill_dir / "stale.pss"
+        _touch(stale)
+
+        real_scandir = os.scandir
+
+        def fake_scandir(path: str) -> Any:
+            if os.fspath(path) == str(queue_dir):
+                raise PermissionError(13, "Permission denied", str(queue_dir))
+            return real_scandir(path)
+
+        monkeypatch.setattr(pss_cleanup.os, "scandir", fake_scandir)
+
+        result = run_main(
+            monkeypatch,
+            capsys,
+            env={"PSS_CLEANUP_TEST_QUEUE_DIR": str(queue_dir)},
+        )
+        assert result.returncode == 0
+        assert not stale.exists(), "Skill-dir .pss files must still be deleted"
+        assert (queue_dir / "queued.pss").exists()
+        assert "Cleaned 1 .pss files from 1 locations" in result.stdout
+
 
 class TestCleanupIdempotent:
     """Tests verifying idempotent behavior."""
 
-    def test_no_pss_files_prints_nothing_found(self, tmp_path: Path) -> None:
+    def test_no_pss_files_prints_nothing_found(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """When no .pss files exist, prints 'No stale .pss files found' and exits 0."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
         (skill_dir / "normal.md").touch()
 
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH)],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-                "PSS_CLEANUP_TEST_QUEUE_DIR": str(tmp_path / "nonexistent"),
-            },
-        )
+        result = run_main(monkeypatch, capsys)
         assert result.returncode == 0
         assert "No stale .pss files found" in result.stdout
 
-    def test_double_run_is_safe(self, tmp_path: Path) -> None:
+    def test_double_run_is_safe(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Running cleanup twice in a row is safe - second run finds nothing."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
-        (skill_dir / "once.pss").write_text("content")
-
-        env = {
-            **__import__("os").environ,
-            "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-            "PSS_CLEANUP_TEST_QUEUE_DIR": str(tmp_path / "nonexistent"),
-        }
+        _touch(skill_dir / "once.pss")
 
         # First run deletes
-        r1 = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH)],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env=env,
-        )
+        r1 = run_main(monkeypatch, capsys)
         assert r1.returncode == 0
 
         # Second run finds nothing
-        r2 = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH)],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env=env,
-        )
+        r2 = run_main(monkeypatch, capsys)
         assert r2.returncode == 0
         assert "No stale .pss files found" in r2.stdout
 
@@ -274,25 +398,18 @@ class TestCleanupIdempotent:
 class TestCleanupSummary:
     """Tests for summary output."""
 
-    def test_summary_shows_count(self, tmp_path: Path) -> None:
+    def test_summary_shows_count(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
         """Summary line shows count of cleaned files and locations."""
-        skill_dir = tmp_path / "skills"
-        skill_dir.mkdir()
-        (skill_dir / "a.pss").write_text("a")
-        (skill_dir / "b.pss").write_text("b")
-        (skill_dir / "c.pss").write_text("c")
-
-        result = subprocess.run(
-            [sys.executable, str(SCRIPT_PATH)],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={
-                **__import__("os").environ,
-                "PSS_CLEANUP_TEST_SKILL_DIRS": str(skill_dir),
-                "PSS_CLEANUP_TEST_QUEUE_DIR": str(tmp_path / "nonexistent"),
-            },
-        )
+        _touch(skill_dir / "a.pss")
+        _touch(skill_dir / "b.pss")
+        _touch(skill_dir / "c.pss")
+
+        result = run_main(monkeypatch, capsys)
         assert result.returncode == 0
         assert "Cleaned 3 .pss files from" in result.stdout
 
@@ -300,13 +417,19 @@ class TestCleanupSummary:
 class TestCleanupCLI:
     """Tests for CLI argument parsing."""
 
-    def test_help_flag(self) -> None:
+    def test_help_flag(self, help_output: subprocess.CompletedProcess[bytes]) -> None:
         """--help prints usage information and exits 0."""
-        result = run_cleanup("--help")
-        assert result.returncode == 0
-        assert "cleanup" in result.stdout.lower() or "pss" in result.stdout.lower()
-
-    def test_unknown_flag_exits_nonzero(self) -> None:
-        """Unknown CLI flags cause a non-zero exit."""
-        result = run_cleanup("--unknown-flag-xyz")
-        assert result.returncode != 0
+        assert help_output.returncode == 0
+        stdout = help_output.stdout.lower()
+        assert b"cleanup" in stdout or b"pss" in stdout
+
+    def test_unknown_flag_exits_nonzero(
+        self,
+        skill_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Unknown CLI flags make argparse exit with usage error code 2."""
+        result = run_main(monkeypatch, capsys, "--unknown-flag-xyz")
+        assert result.returncode == 2
+        assert "unrecognized arguments" in result.stderr